@@ -1,4 +1,5 @@
 from logic import *
+from pysat.solvers import Glucose3
 
 AKnight = Symbol("A is a Knight")
 AKnave = Symbol("A is a Knave")
@@ -9,46 +10,43 @@ BKnave = Symbol("B is a Knave")
 CKnight = Symbol("C is a Knight")
 CKnave = Symbol("C is a Knave")
 
+# Each character is either a knight or a knave, but not both
+EXACTLY_ONE_A = Biconditional(AKnight, Not(AKnave))
+EXACTLY_ONE_B = Biconditional(BKnight, Not(BKnave))
+EXACTLY_ONE_C = Biconditional(CKnight, Not(CKnave))
+
 # Puzzle 0
 # A says "I am both a knight and a knave."
 knowledge0 = And(
-    #A is a knight or a knave but not both
-    Or(AKnight, AKnave),
-    Not(And(AKnight, AKnave)),
+    EXACTLY_ONE_A,
 
-    # If A is a knight, he tells the truth and vice vers
-    Implication(AKnight, And(AKnight, AKnave)),
-    Implication(AKnave, Not(And(AKnight, AKnave)))
+    # A is a knight exactly when what he says is true
+    Biconditional(AKnight, And(AKnight, AKnave))
 )
 
 # Puzzle 1
 # A says "We are both knaves."
 # B says nothing.
 knowledge1 = And(
-    # A and B are either knights or knaves but not both
-    And(Or(AKnight, AKnave), Not(And(AKnight, AKnave))),
-    And(Or(BKnight, BKnave), Not(And(BKnight, BKnave))),
+    EXACTLY_ONE_A,
+    EXACTLY_ONE_B,
 
     # A says that both are knaves
-    Implication(AKnight, And(AKnave, BKnave)),
-    Implication(AKnave, Not(And(AKnave, BKnave)))
+    Biconditional(AKnight, And(AKnave, BKnave))
 )
 
 # Puzzle 2
 # A says "We are the same kind."
 # B says "We are of different kinds."
 knowledge2 = And(
-    # A and B are either knights or knaves but not both
-    And(Or(AKnight, AKnave), Not(And(AKnight, AKnave))),
-    And(Or(BKnight, BKnave), Not(And(BKnight, BKnave))),
+    EXACTLY_ONE_A,
+    EXACTLY_ONE_B,
 
-    # If a is a knight then they are smae kind and vice versa
-    Implication(AKnight, Or(And(AKnight, BKnight), And(BKnave, AKnave))),
-    Implication(BKnight, Or(And(AKnight, BKnave), And(AKnave, BKnight))),
+    # A says they are the same kind
+    Biconditional(AKnight, Biconditional(AKnight, BKnight)),
 
-    # If B is a knight then they are of different kind an dvice versa
-    Implication(AKnave, Not(Or(And(AKnight, BKnight), And(BKnave, AKnave)))),
-    Implication(BKnave, Not(Or(And(AKnight, BKnave), And(AKnave, BKnight))))
+    # B says they are of different kinds
+    Biconditional(BKnight, Not(Biconditional(AKnight, BKnight)))
 )
 
 # Puzzle 3
@@ -57,25 +55,82 @@ knowledge2 = And(
 # B says "C is a knave."
 # C says "A is a knight."
 knowledge3 = And(
-    # A, B, C are knights or knaves but not both
-    And(Or(AKnight, AKnave), Not(And(AKnight, AKnave))),
-    And(Or(BKnight, BKnave), Not(And(BKnight, BKnave))),
-    And(Or(CKnight, CKnave), Not(And(CKnight, CKnave))),
-
-    # If C is a knight then A is a knight and vice versa
-    Implication(CKnight, AKnight),
-    Implication(CKnave, Not(AKnight)),
-
-    # If B is a knight then C is a knave and vice versa
-    Implication(BKnight, CKnave),
-    Implication(BKnave, Not(CKnave)),
-
-    # If B is a knight then A said he was a knave and vice versa
-    Implication(BKnight, And(Implication(AKnight, AKnave), Implication(AKnave, Not(AKnave)))),
-    Implication(BKnave, And(Implication(AKnight, AKnight), Implication(AKnave, AKnave))),
+    EXACTLY_ONE_A,
+    EXACTLY_ONE_B,
+    EXACTLY_ONE_C,
+
+    # C says A is a knight
+    Biconditional(CKnight, AKnight),
+
+    # B says C is a knave
+    Biconditional(BKnight, CKnave),
+
+    # If B is a knight then A said he was a knave; otherwise A said he was a
+    # knight, which either kind of A could say, so that case adds nothing
+    Implication(BKnight, Biconditional(AKnight, AKnave)),
 )
 
 
+def to_cnf_clauses(sentence, var_map, positive=True):
+    """
+    Returns `sentence` (or its negation if not `positive`) in CNF as a list
+    of clauses, each a list of integers where -n means "not symbol n".
+    Symbols are numbered from 1 as they are first seen and added to `var_map`.
+    """
+    if isinstance(sentence, Symbol):
+        var = var_map.setdefault(sentence.name, len(var_map) + 1)
+        return [[var if positive else -var]]
+    if isinstance(sentence, Not):
+        return to_cnf_clauses(sentence.operand, var_map, not positive)
+    if isinstance(sentence, Implication):
+        return to_cnf_clauses(
+            Or(Not(sentence.antecedent), sentence.consequent), var_map, positive
+        )
+    if isinstance(sentence, Biconditional):
+        return to_cnf_clauses(And(
+            Implication(sentence.left, sentence.right),
+            Implication(sentence.right, sentence.left)
+        ), var_map, positive)
+
+    # By De Morgan, a negated And is an Or of negations and vice versa
+    if isinstance(sentence, And):
+        operands, is_conjunction = sentence.conjuncts, positive
+    elif isinstance(sentence, Or):
+        operands, is_conjunction = sentence.disjuncts, not positive
+    else:
+        raise TypeError("must be a logical sentence")
+
+    # A conjunction just collects the clauses of each operand
+    if is_conjunction:
+        return [clause for operand in operands
+                for clause in to_cnf_clauses(operand, var_map, positive)]
+
+    # A disjunction distributes over the clauses of each operand
+    clauses = [[]]
+    for operand in operands:
+        clauses = [clause + other for clause in clauses
+                   for other in to_cnf_clauses(operand, var_map, positive)]
+    return clauses
+
+
+def entailed_symbols(knowledge, symbols):
+    """
+    Returns the symbols in `symbols` that knowledge entails, i.e. those true
+    in every model of knowledge, enumerating those models only once.
+    """
+    var_map = dict()
+    clauses = to_cnf_clauses(knowledge, var_map)
+    entailed = set(symbols)
+    with Glucose3(bootstrap_with=clauses) as solver:
+        for model in solver.enum_models():
+            true_vars = {var for var in model if var > 0}
+            entailed = {
+                symbol for symbol in entailed
+                if var_map.get(symbol.name) in true_vars
+            }
+    return entailed
+
+
 def main():
     symbols = [AKnight, AKnave, BKnight, BKnave, CKnight, CKnave]
     puzzles = [
@@ -89,8 +144,9 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
+            entailed = entailed_symbols(knowledge, symbols)
             for symbol in symbols:
-                if model_check(knowledge, symbol):
+                if symbol in entailed:
                     print(f"    {symbol}")
 
 
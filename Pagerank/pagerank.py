@@ -1,12 +1,27 @@
+import mmap
 import os
-import random
 import re
 import sys
 import numpy as np
+from numba import njit, prange
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Above this many pages, iterate_pagerank keeps ranks in float32 to halve
+# the memory traffic of each sweep
+FLOAT32_MIN_PAGES = 10_000
+
+# Above this many pages, iterate_pagerank spreads each sweep across CPU cores
+# instead of running the sequential Gauss-Seidel sweep
+PARALLEL_MIN_PAGES = 10_000
+
+# Above this many pages, sample_pagerank walks the links directly instead of
+# building the dense N x N cumulative transition matrix
+SPARSE_SAMPLER_MIN_PAGES = 2_000
+
+HREF = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", re.ASCII)
+
 
 def main():
     if len(sys.argv) != 2:
@@ -34,21 +49,40 @@ def crawl(directory):
     for filename in os.listdir(directory):
         if not filename.endswith(".html"):
             continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+        with open(os.path.join(directory, filename), "rb") as f:
+            # mmap cannot map an empty file, and it has no links anyway
+            if os.fstat(f.fileno()).st_size == 0:
+                links = []
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    links = HREF.findall(mm)
+            pages[filename] = {link.decode() for link in links} - {filename}
 
     # Only include links to other pages in the corpus
+    page_set = pages.keys()
     for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
+        pages[filename] = pages[filename] & page_set
 
     return pages
 
 
+def _as_csr(corpus):
+    """
+    Flatten `corpus` into the list of page names and CSR arrays over page
+    indices: the pages linked to by page u are indices[indptr[u]:indptr[u + 1]],
+    and out_degree[u] is how many there are.
+    """
+    names = list(corpus)
+    idx = {name: i for i, name in enumerate(names)}
+    out_degree = np.array([len(corpus[name]) for name in names], dtype=np.int64)
+    indptr = np.zeros(len(names) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(out_degree)
+    indices = np.array(
+        [idx[v] for name in names for v in corpus[name]], dtype=np.int64
+    )
+    return names, indptr, indices, out_degree
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -58,30 +92,30 @@ def transition_model(corpus, page, damping_factor):
     linked to by `page`. With probability `1 - damping_factor`, choose
     a link at random chosen from all pages in the corpus.
     """
-    # Create a dictionary which we will return
-    return_dict = dict()
+    pages = list(corpus)
+    N = len(pages)
     # Edge Case: If it links to no page then choose among any with equal probability
-    if len(corpus[page]) == 0:
-        for x in corpus:
-            return_dict[x] = 0
-        for page, prob in return_dict.items():
-            prob += 1 / len(return_dict)
-        return return_dict
-    # Iterate over all the pages that the current page links to and add them to the return dictionary
-    for x in corpus[page]:
-        return_dict[x] = 0
-    # Add the probability for each page
-    for x in return_dict:
-        return_dict[x] += damping_factor / len(corpus[page])
-    # Iterate over dictionary again and add all the missing pages to the return dictionary
-    for x in corpus:
-        if x not in return_dict:
-            return_dict[x] = 0
-    # Increase the probability for each because of random choosing
-    for x in return_dict:
-        return_dict[x] += (1 - damping_factor) / len(corpus)
-    # Return the dictionary
-    return return_dict
+    links = corpus[page] or corpus
+    is_linked = np.array([x in links for x in pages])
+    row = np.full(N, (1 - damping_factor) / N)
+    row[is_linked] += damping_factor / len(links)
+    return dict(zip(pages, row.tolist()))
+
+
+def transition_matrix(corpus, damping_factor):
+    """
+    Return the list of pages in `corpus` and a matrix whose row `i` is the
+    transition model for `pages[i]`, in the same page order.
+    """
+    pages, indptr, indices, out_degree = _as_csr(corpus)
+    N = len(pages)
+    T = np.zeros((N, N))
+    # A page with no links is treated as linking to every page
+    sources = np.repeat(np.arange(N), out_degree)
+    T[sources, indices] = damping_factor / out_degree[sources]
+    T[out_degree == 0] = damping_factor / N
+    T += (1 - damping_factor) / N
+    return pages, T
 
 
 def sample_pagerank(corpus, damping_factor, n):
@@ -93,17 +127,71 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    distribution = dict()
-    for page in corpus:
-        distribution[page] = 0
-    pagef = random.choice(list(corpus.keys()))
-    for i in range(1, n):
-        current_distribution = transition_model(corpus, pagef, damping_factor)
-        for page in distribution:
-            distribution[page] = ((i-1) * distribution[page] + current_distribution[page]) / i
+    if n < 1:
+        raise ValueError("n must be at least 1")
+
+    rng = np.random.default_rng()
+    if len(corpus) > SPARSE_SAMPLER_MIN_PAGES:
+        # Follow a link with probability `damping_factor`, otherwise jump to a
+        # page chosen uniformly; links are equally likely, so picking one is
+        # a scaled index into the page's slice of `indices`
+        pages, indptr, indices, out_degree = _as_csr(corpus)
+        N = len(pages)
+        counts = _walk_sparse(
+            indptr, indices, rng.integers(N), rng.random(n - 1),
+            rng.random(n - 1), damping_factor
+        )
+        return dict(zip(pages, (counts / n).tolist()))
+
+    # Every step from the same page draws from the same distribution, so
+    # compute each page's transition model once up front
+    pages, T = transition_matrix(corpus, damping_factor)
+    N = len(pages)
+    CDF = np.cumsum(T, axis=1, out=T)
+    # Guard against rounding leaving the last bucket just below 1
+    CDF[:, -1] = 1.0
+
+    # Draw the start page and every step's uniform number up front
+    counts = _walk(CDF, rng.integers(N), rng.random(n - 1))
+    return dict(zip(pages, (counts / n).tolist()))
+
+
+@njit(cache=True)
+def _walk(CDF, start, rands):
+    """
+    Count visits to each page along a chain that starts at page `start` and
+    takes one step per number in `rands`, where row u of `CDF` is the
+    cumulative transition model for page u.
+    """
+    counts = np.zeros(CDF.shape[0], dtype=np.int64)
+    u = start
+    counts[u] += 1
+    for i in range(len(rands)):
+        u = np.searchsorted(CDF[u], rands[i], side="right")
+        counts[u] += 1
+    return counts
+
 
-        pagef = random.choices(list(distribution.keys()), list(distribution.values()), k=1)[0]
-    return distribution 
+@njit(cache=True)
+def _walk_sparse(indptr, indices, start, follow, pick, d):
+    """
+    Count visits to each page along a chain that starts at page `start`,
+    using the CSR link arrays in place of a transition matrix. Step i follows
+    a link when follow[i] < `d` and the page has links, otherwise it jumps to
+    a uniformly chosen page; pick[i] chooses which link or page.
+    """
+    N = len(indptr) - 1
+    counts = np.zeros(N, dtype=np.int64)
+    u = start
+    counts[u] += 1
+    for i in range(len(follow)):
+        degree = indptr[u + 1] - indptr[u]
+        if degree > 0 and follow[i] < d:
+            u = indices[indptr[u] + int(pick[i] * degree)]
+        else:
+            u = int(pick[i] * N)
+        counts[u] += 1
+    return counts
 
 
 def iterate_pagerank(corpus, damping_factor):
@@ -115,31 +203,105 @@ def iterate_pagerank(corpus, damping_factor):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    dictionary = dict()
-    for x in corpus.keys():
-        dictionary[x] = 0
-    
-        N = len(dictionary)
-    for x in dictionary:
-        dictionary[x] = 1 / N
-    threshold = 0.0005
+    pages, indptr, indices, out_degree = _as_csr(corpus)
+    N = len(pages)
+    # Ranks average 1/N, so measure convergence relative to that rather
+    # than against a fixed value that large corpora are already below
+    threshold = 0.0005 / N
+
+    # Transpose to CSR arrays over incoming links: the pages that link to
+    # page v are in_src[in_ptr[v]:in_ptr[v + 1]]
+    order = np.argsort(indices, kind="stable")
+    in_src = np.repeat(np.arange(N), out_degree)[order]
+    in_ptr = np.zeros(N + 1, dtype=np.int64)
+    in_ptr[1:] = np.cumsum(np.bincount(indices, minlength=N))
+
+    # Large corpora use float32, since their sweeps are limited by memory
+    # bandwidth; it still resolves changes far smaller than the threshold
+    dtype = np.float32 if N > FLOAT32_MIN_PAGES else np.float64
+
+    # A page with no links is treated as linking to every page
+    is_dangling = out_degree == 0
+    inv_out = np.zeros(N, dtype=dtype)
+    inv_out[~is_dangling] = 1 / out_degree[~is_dangling]
+
+    r = np.full(N, 1 / N, dtype=dtype)
+    run = _pr_iter if N > PARALLEL_MIN_PAGES else _pr_gauss_seidel
+    run(in_ptr, in_src, inv_out, is_dangling, r, damping_factor, threshold)
+    return dict(zip(pages, r.tolist()))
+
 
+@njit(cache=True, fastmath=True)
+def _pr_gauss_seidel(in_ptr, in_src, inv_out, is_dangling, r, d, tol):
+    """
+    Run PageRank over a corpus flattened to CSR arrays of incoming links,
+    starting from and updating the rank vector `r` until no value changes
+    by `tol` or more.
+
+    Ranks are updated in place (Gauss-Seidel), so a page already updated in
+    this sweep contributes its new rank to the pages after it. This usually
+    needs about half as many sweeps as _pr_iter, but a sweep cannot be split
+    across cores and the result depends slightly on page order, so the final
+    ranks are renormalised to sum to 1.
+    """
+    N = len(r)
+    base = (1 - d) / N
+    d_over_n = d / N
+    dsum = 0.0
+    for u in range(N):
+        if is_dangling[u]:
+            dsum += r[u]
+    while True:
+        max_change = 0.0
+        for v in range(N):
+            acc = 0.0
+            for k in range(in_ptr[v], in_ptr[v + 1]):
+                u = in_src[k]
+                acc += r[u] * inv_out[u]
+            new = base + d * acc + d_over_n * dsum
+            max_change = max(max_change, abs(new - r[v]))
+            if is_dangling[v]:
+                dsum += new - r[v]
+            r[v] = new
+        if max_change < tol:
+            r /= r.sum()
+            return
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def _pr_iter(in_ptr, in_src, inv_out, is_dangling, r, d, tol):
+    """
+    Run PageRank over a corpus flattened to CSR arrays of incoming links,
+    starting from and updating the rank vector `r` until no value changes
+    by `tol` or more.
+
+    Each page pulls rank from the pages linking to it and writes only its
+    own new rank, so pages are updated in parallel across CPU cores. Every
+    page reads the ranks from the previous sweep (Jacobi), so this takes
+    more sweeps than _pr_gauss_seidel but each one uses all cores.
+    """
+    N = len(r)
+    base = (1 - d) / N
+    d_over_n = d / N
+    r_new = np.empty_like(r)
     while True:
-        count = 0
-        for x in dictionary:
-            adding_fac1 = (1 - damping_factor) / N
-            adding_fac2 = 0
-            for y in corpus:
-                if x in corpus[y]:
-                    adding_fac2 += dictionary[y] / len(corpus[y])
-            adding_fac2 = damping_factor * adding_fac2
-            to_add = adding_fac1 + adding_fac2
-            if abs(dictionary[x] - to_add) < threshold:
-                count += 1
-            dictionary[x] = to_add
-        if count == N:
-            break
-    return dictionary
+        dsum = 0.0
+        for u in prange(N):
+            if is_dangling[u]:
+                dsum += r[u]
+        teleport = base + d_over_n * dsum
+        for v in prange(N):
+            acc = 0.0
+            for k in range(in_ptr[v], in_ptr[v + 1]):
+                u = in_src[k]
+                acc += r[u] * inv_out[u]
+            r_new[v] = teleport + d * acc
+        converged = np.max(np.abs(r_new - r)) < tol
+        r[:] = r_new
+        if converged:
+            # Undo any drift from rounding so the ranks sum to 1
+            r /= r.sum()
+            return
 
 
 if __name__ == "__main__":